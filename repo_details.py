@@ -3,8 +3,24 @@ Get information about a repository.
 """
 import os
 import re
-from time import localtime, strptime, strftime
-from git import Repo, GitCmdObjectDB
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from time import localtime, strftime
+
+
+# The keywords of a version format, longest first so '%mc' is not read as '%m' followed by a 'c'.
+_FORMAT_RE = re.compile(r'(%dmc|%spr|%sbm|%dsh|%mc|%sh|%hm|%s|%M|%m|%p)')
+
+
+@lru_cache(maxsize=32)
+def _compile_format(formatting):
+    """
+    Split a format string into its literal text and its keywords.
+    :param formatting: the format string that has keywords that will be replaced
+    :return: a tuple of (is_keyword, text) pairs
+    """
+    return tuple((index % 2 == 1, part)
+                 for index, part in enumerate(_FORMAT_RE.split(formatting)) if part)
 
 
 class RepoDetails:
@@ -33,64 +49,86 @@ class RepoDetails:
         self.repo_path = repo_path
         self.tag_prefix = tag_prefix
         self.tag_match_pattern = tag_match_pattern
+        self._match_re = re.compile(tag_prefix + tag_match_pattern)
         self.datetime_format = datetime_format
         self.default_version_format = version_format
-        self.sub_paths = []
-        if sub_paths:
-            for i in range(0, len(sub_paths)):
-                sub_paths[i] = sub_paths[i].replace('\\', '/')
-                sub_paths[i] = sub_paths[i].lstrip('/')
-                self.sub_paths.append(sub_paths[i])
-
-        self._repo = Repo(repo_path, odbt=GitCmdObjectDB)
-        self._sub_path_commits = list(self._repo.iter_commits(paths=self.sub_paths))
-        self._all_commits = list(self._repo.iter_commits())
-        self._commit = self._repo.head.commit
-        self._index = self._repo.index
+        # The root of the repository is '.', since git does not accept an empty path.
+        self.sub_paths = tuple(sub_path.replace('\\', '/').lstrip('/') or '.'
+                               for sub_path in sub_paths or [])
+
+        self._repo = None
+        self._sub_path_sha = None
+        self._commit_number = None
+        self._dir_commit_number = None
+        self._head_sha = None
+        self._branch_name = None
+        self._authored_datetime = None
+        self._tags = None
         self._modification_count = None
         self._dir_modification_count = None
         self._use_directory_hash = use_directory_hash
         self._versions_dict = {}
-        assert not self._repo.bare
-        self._calculate_version_value()
+        self._format_tokens = {
+            '%dmc': self.dir_mods,
+            '%mc': self.mods,
+            '%spr': self.semver_pre_release,
+            '%sbm': self.semver_build_metadata,
+            '%dsh': self.dir_sha,
+            '%sh': self.sha,
+            '%M': self.major,
+            '%m': self.minor,
+            '%p': self.patch,
+            '%hm': self.has_mods,
+        }
+        self._default_separator = None
+        self._major = None
+        self._minor = None
+        self._patch = None
+
+    def _ensure_repo(self):
+        """
+        Open the repository the first time it is needed.
+        :return: the git Repo object
+        """
+        if self._repo is None:
+            # GitPython is slow to import, so it is only imported once a repository is opened.
+            from git import Repo, GitCmdObjectDB
+
+            repo = Repo(self.repo_path, odbt=GitCmdObjectDB)
+            assert not repo.bare
+            self._repo = repo
+
+        return self._repo
 
     def _calculate_version_value(self):
         """
-        Calculate version values: major, minor, patch
+        Calculate version values: major, minor, patch. They are only calculated the first time
+        they are needed.
         :return: None
         """
-        # Get all the tags that have the correct prefix and match the pattern.
-        match_pattern = self.tag_prefix + self.tag_match_pattern
-        tags = []
-        for tag in self._repo.tags:
-            if re.match(match_pattern, str(tag)):
-                tags.append(tag)
+        if self._patch is not None:
+            return
 
         # Search through the commits from newest to oldest searching for one that contains a tag
-        # that matches the pattern.
-        commits = self._sub_path_commits
+        # that matches the pattern. The commits are read lazily so the walk stops at the tag.
+        tags = self._tag_sha_map()
         tag_name = ''
-        self._patch = 0
-        for _, commit in enumerate(commits):
-            for tag in tags:
-                # if the commit sha matches one of the tag sha's then use this tag and break
-                if tag.commit.hexsha == commit.hexsha:
-                    tag_name = tag.name
-                    break
-
-            if tag_name != '':
+        patch = 0
+        for sha in self._iter_commit_shas():
+            # if the commit sha matches one of the tag sha's then use this tag and break
+            if sha in tags:
+                tag_name = tags[sha]
                 break
 
             # increment the patch number
-            self._patch += 1
+            patch += 1
 
         self._default_separator = '.'
         self._major = '0'
         self._minor = '0'
-        self._patch = str(self._patch)
 
         # Use regex to pull the major and minor string from the tag, as well as the separator.
-        match = re.match(match_pattern, tag_name)
+        match = self._match_re.match(tag_name)
         if match:
             if match.group('major'):
                 self._major = match.group('major')
@@ -99,44 +137,163 @@ class RepoDetails:
             if match.group('separator'):
                 self._default_separator = match.group('separator')
 
+        # The patch is set last, since it marks the version values as calculated.
+        self._patch = str(patch)
+
+    def _tag_sha_map(self):
+        """
+        Get the names of all the tags that have the correct prefix and match the pattern, keyed by
+        the sha of the commit they point at. The tags are read once, with the commit each annotated
+        tag peels to, by a single git for-each-ref, so only tags of tags need another lookup.
+        :return: a dict of commit sha to tag name
+        """
+        if self._tags is None:
+            self._tags = {}
+            refs = self._ensure_repo().git.for_each_ref(
+                'refs/tags',
+                format='%(refname:strip=2) %(objecttype) %(objectname) '
+                       '%(*objecttype) %(*objectname)')
+            for line in refs.splitlines():
+                tag_name, object_type, object_sha, peeled_type, peeled_sha = line.split(' ')
+                if not self._match_re.match(tag_name):
+                    continue
+
+                # A lightweight tag points straight at the commit, and an annotated tag peels to it.
+                # The peel is only one level deep, so a tag of a tag is peeled by rev-parse.
+                if object_type == 'commit':
+                    commit_sha = object_sha
+                elif peeled_type == 'commit':
+                    commit_sha = peeled_sha
+                elif peeled_type == 'tag':
+                    commit_sha = self._peel_to_commit('refs/tags/' + tag_name)
+                else:
+                    commit_sha = None
+
+                if commit_sha:
+                    self._tags.setdefault(commit_sha, tag_name)
+
+        return self._tags
+
+    def _peel_to_commit(self, ref):
+        """
+        Get the sha of the commit a ref points at, following any number of tags.
+        :param ref: the ref to peel
+        :return: the sha as a string, or None if the ref does not point at a commit
+        """
+        from git import GitCommandError
+
+        try:
+            return self._ensure_repo().git.rev_parse('--verify', '--quiet', ref + '^{commit}')
+        except GitCommandError:
+            return None
+
+    def _sub_path_commit_sha(self):
+        """
+        The sha of the most recent commit with changes to a file in the sub_paths.
+        :return: the full sha as a string
+        """
+        if self._sub_path_sha is None:
+            self._sub_path_sha = \
+                self._ensure_repo().git.log('-1', '--format=%H', '--', *self.sub_paths)
+
+        return self._sub_path_sha
+
+    def _iter_commit_shas(self):
+        """
+        Iterate over the shas of the commits that change the sub_paths, from newest to oldest.
+        A single git rev-list process is streamed, so stopping early stops the walk.
+        :return: a generator of sha strings
+        """
+        process = self._ensure_repo().git.rev_list('HEAD', '--', *self.sub_paths, as_process=True)
+        for line in process.stdout:
+            yield line.decode('ascii').strip()
+
+        # The whole history was read, so make sure it was not cut short by git failing. This raises
+        # a GitCommandError if git exited with an error.
+        process.wait()
+
+    def _local_modifications(self, *paths):
+        """
+        The tracked files that have staged or unstaged modifications, read from a single
+        git status.
+        :param paths: only report files in these paths, git reads them as pathspecs
+        :return: a list of the modified paths
+        """
+        status = self._ensure_repo().git.status('--porcelain=v1', '-z', '--untracked-files=no',
+                                                '--', *paths)
+        records = iter(status.split('\0'))
+        modified_paths = []
+        for record in records:
+            if not record:
+                continue
+
+            # Each record is 'XY <path>'; renames and copies are followed by the original path.
+            modified_paths.append(record[3:])
+            if 'R' in record[:2] or 'C' in record[:2]:
+                next(records, None)
+
+        return modified_paths
+
     def _apply_format(self, formatting, separator=None):
         """
-        Apply formatting
+        Apply formatting. Every value is fixed for the checked out commit, so each formatted
+        string is only built once.
         :param separator: the character that separates the different parts of the version
         :param formatting: the format string that has keywords that will be replaced
         :return: a string with replaced keywords
         """
         if not separator:
+            self._calculate_version_value()
             separator = self._default_separator
-        formatting = formatting.replace('%dmc', '{self.dir_mods()}')
-        formatting = formatting.replace('%mc', '{self.mods()}')
-        formatting = formatting.replace('%spr', '{self.semver_pre_release()}')
-        formatting = formatting.replace('%sbm', '{self.semver_build_metadata()}')
-        formatting = formatting.replace('%dsh', '{self.dir_sha()}')
-        formatting = formatting.replace('%sh', '{self.sha()}')
-        formatting = formatting.replace('%s', '{separator}')
-        formatting = formatting.replace('%M', '{self._major}')
-        formatting = formatting.replace('%m', '{self._minor}')
-        formatting = formatting.replace('%p', '{self._patch}')
-        formatting = formatting.replace('%hm', '{self.has_modifications()}')
-        return eval(f'f"""{formatting}"""')
+
+        key = (formatting, separator)
+        if key not in self._versions_dict:
+            text = []
+            for is_keyword, part in _compile_format(formatting):
+                if not is_keyword:
+                    text.append(part)
+                elif part == '%s':
+                    text.append(str(separator))
+                else:
+                    text.append(str(self._format_tokens[part]()))
+            self._versions_dict[key] = ''.join(text)
+
+        return self._versions_dict[key]
 
     def branch_name(self):
         """
         The name of the currently checked out branch
         :return: the name of the branch as a string
         """
-        try:
-            return self._repo.active_branch
-        except TypeError:
-            return "detached"
+        if self._branch_name is None:
+            try:
+                self._branch_name = str(self._ensure_repo().active_branch)
+            except TypeError:
+                self._branch_name = "detached"
+
+        return self._branch_name
 
     def commit_number(self):
         """
         The number of commits in the history of the currently checked out branch
         :return: the number of commits
         """
-        return len(self._all_commits)
+        if self._commit_number is None:
+            self._commit_number = int(self._ensure_repo().git.rev_list('--count', 'HEAD'))
+
+        return self._commit_number
+
+    def dir_commit_number(self):
+        """
+        The number of commits with changes to a file in the sub_paths in the history of the
+        currently checked out branch
+        :return: the number of commits
+        """
+        if self._dir_commit_number is None:
+            self._dir_commit_number = \
+                int(self._ensure_repo().git.rev_list('--count', 'HEAD', '--', *self.sub_paths))
+
+        return self._dir_commit_number
 
     def sha(self, num_chars=7):
         """
@@ -152,7 +309,10 @@ class RepoDetails:
         if self._use_directory_hash:
             return self.dir_sha(num_chars)
 
-        return self._commit.hexsha[:num_chars]
+        if self._head_sha is None:
+            self._head_sha = self._ensure_repo().head.commit.hexsha
+
+        return self._head_sha[:num_chars]
 
     def dir_sha(self, num_chars=7):
         """
@@ -165,8 +325,7 @@ class RepoDetails:
         except ValueError:
             num_chars = 7
 
-        commit = self._sub_path_commits[0]
-        return commit.hexsha[:num_chars]
+        return self._sub_path_commit_sha()[:num_chars]
 
     def commit_datetime(self, datetime_format=None):
         """
@@ -175,9 +334,9 @@ class RepoDetails:
         """
         if not datetime_format:
             datetime_format = self.datetime_format
-        authored_datetime = ''.join(str(self._commit.authored_datetime).rsplit(':', 1))
-        time_structure = strptime(authored_datetime, '%Y-%m-%d %H:%M:%S%z')
-        return strftime(datetime_format, time_structure)
+        if self._authored_datetime is None:
+            self._authored_datetime = self._ensure_repo().head.commit.authored_datetime
+        return self._authored_datetime.strftime(datetime_format)
 
     def current_datetime(self, datetime_format=None):
         """
@@ -197,8 +356,7 @@ class RepoDetails:
             return self.dir_mods()
 
         if self._modification_count is None:
-            self._modification_count = \
-                len(self._all_commits[0].diff(None)) + len(self._all_commits[0].diff('HEAD'))
+            self._modification_count = len(self._local_modifications())
 
         return self._modification_count
 
@@ -208,9 +366,7 @@ class RepoDetails:
         :return: the number of modifications as an int, or a string if a format is provided
         """
         if self._dir_modification_count is None:
-            self._dir_modification_count = \
-                len(self._sub_path_commits[0].diff(None, self.sub_paths)) + \
-                len(self._sub_path_commits[0].diff('HEAD', self.sub_paths))
+            self._dir_modification_count = len(self._local_modifications(*self.sub_paths))
 
         return self._dir_modification_count
 
@@ -281,6 +437,7 @@ class RepoDetails:
         The major value of the version
         :return: A string
         """
+        self._calculate_version_value()
         return self._major
 
     def minor(self):
@@ -288,6 +445,7 @@ class RepoDetails:
         The minor value of the version
         :return: A string
         """
+        self._calculate_version_value()
         return self._minor
 
     def patch(self):
@@ -295,6 +453,7 @@ class RepoDetails:
         The patch value of the version
         :return: A string
         """
+        self._calculate_version_value()
         return self._patch
 
     def print_summary(self):
@@ -302,6 +461,17 @@ class RepoDetails:
         Prints a summary of the repository.
         :return: None
         """
+        # The summary needs the results of several independent git commands, so run them at the
+        # same time and then print from the cached values. This always reads the tags, the
+        # history and the status, so opening the repository lazily saves nothing here.
+        self._ensure_repo()
+        queries = [self._calculate_version_value, self.mods]
+        if self._use_directory_hash:
+            queries.append(self._sub_path_commit_sha)
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            for future in [executor.submit(query) for query in queries]:
+                future.result()
+
         print(f"repo path: {self.repo_path}")
         print(f"branch: {self.branch_name()}")
         print(f"sha: {self.sha()}")
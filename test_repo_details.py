@@ -0,0 +1,203 @@
+"""
+Tests for the RepoDetails class, run against a temporary git repository.
+"""
+import os
+import subprocess
+import tempfile
+import unittest
+from repo_details import RepoDetails
+
+
+class RepoDetailsTestCase(unittest.TestCase):
+    """
+    Create an empty git repository for each test.
+    """
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.repo_path = self._temp_dir.name
+        self.git('init', '-q', '-b', 'main')
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def git(self, *args):
+        """
+        Run a git command in the temporary repository.
+        :param args: the git arguments
+        :return: the output of the command, without the trailing newline
+        """
+        return subprocess.run(
+            ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+             '-c', 'advice.nestedTag=false', *args],
+            cwd=self.repo_path, check=True, capture_output=True, text=True).stdout.strip()
+
+    def write(self, path, text):
+        """
+        Write a file in the temporary repository, creating any directories it needs.
+        :param path: the path relative to the root of the repository
+        :param text: the text of the file
+        :return: None
+        """
+        full_path = os.path.join(self.repo_path, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w') as file:
+            file.write(text)
+
+    def commit(self, *paths):
+        """
+        Write and commit the supplied files, each with a new line of text.
+        :param paths: the paths relative to the root of the repository
+        :return: the sha of the new commit
+        """
+        for path in paths:
+            full_path = os.path.join(self.repo_path, path)
+            text = open(full_path).read() if os.path.exists(full_path) else ''
+            self.write(path, text + 'line\n')
+        self.git('add', '--', *paths)
+        self.git('commit', '-q', '-m', 'change ' + ' '.join(paths))
+        return self.git('rev-parse', 'HEAD')
+
+
+class VersionTest(RepoDetailsTestCase):
+    """
+    Test calculating the version from the tags and the commit history.
+    """
+    def test_no_tags(self):
+        self.commit('a.txt')
+        self.commit('a.txt')
+        self.assertEqual(RepoDetails(self.repo_path).version(), '0.0.2.0')
+
+    def test_commits_since_tag(self):
+        self.commit('a.txt')
+        self.git('tag', 'v1.2')
+        self.commit('a.txt')
+        self.commit('b.txt')
+        self.assertEqual(RepoDetails(self.repo_path, tag_prefix='v').version(), '1.2.2.0')
+        self.assertEqual(RepoDetails(self.repo_path, tag_prefix='v').semver(), '1.2.2')
+
+    def test_commits_since_tag_in_sub_paths(self):
+        self.commit('src/a.txt')
+        self.git('tag', 'v1.2')
+        self.commit('src/a.txt')
+        self.commit('b.txt')
+        self.commit('src/a.txt')
+        repo_details = RepoDetails(self.repo_path, tag_prefix='v', sub_paths=['src'])
+        self.assertEqual(repo_details.version(), '1.2.2.0')
+
+    def test_tag_kinds(self):
+        lightweight_sha = self.commit('a.txt')
+        self.git('tag', 'v1.0')
+        annotated_sha = self.commit('a.txt')
+        self.git('tag', '-a', '-m', 'annotated', 'v2.0')
+        nested_sha = self.commit('a.txt')
+        self.git('tag', '-a', '-m', 'inner', 'inner', 'HEAD')
+        self.git('tag', '-a', '-m', 'outer', 'v3.0', 'inner')
+        self.git('tag', '-a', '-m', 'tree', 'v4.0', 'HEAD^{tree}')
+        self.git('tag', 'v5.0', 'HEAD^{tree}')
+        self.git('tag', 'not-a-version', 'HEAD')
+
+        repo_details = RepoDetails(self.repo_path, tag_prefix='v')
+        self.assertEqual(repo_details._tag_sha_map(), {
+            lightweight_sha: 'v1.0',
+            annotated_sha: 'v2.0',
+            nested_sha: 'v3.0',
+        })
+        self.assertEqual(repo_details.version(), '3.0.0.0')
+
+    def test_tag_of_tag_sets_version(self):
+        self.commit('a.txt')
+        self.git('tag', '-a', '-m', 'inner', 'inner')
+        self.git('tag', '-a', '-m', 'outer', 'v2.1', 'inner')
+        self.commit('a.txt')
+        self.assertEqual(RepoDetails(self.repo_path, tag_prefix='v').version(), '2.1.1.0')
+
+    def test_git_error_is_raised(self):
+        from git import GitCommandError
+
+        self.commit('a.txt')
+        repo_details = RepoDetails(self.repo_path, sub_paths=['../outside'])
+        with self.assertRaises(GitCommandError):
+            repo_details.version()
+
+
+class CommitNumberTest(RepoDetailsTestCase):
+    """
+    Test counting the commits.
+    """
+    def setUp(self):
+        super().setUp()
+        self.commit('a.txt')
+        self.commit('src/b.txt')
+        self.commit('a.txt', 'src/b.txt')
+        self.commit('docs/c.txt')
+
+    def test_commit_number(self):
+        self.assertEqual(RepoDetails(self.repo_path).commit_number(), 4)
+        self.assertEqual(RepoDetails(self.repo_path, sub_paths=['src']).commit_number(), 4)
+
+    def test_dir_commit_number(self):
+        self.assertEqual(RepoDetails(self.repo_path).dir_commit_number(), 4)
+        self.assertEqual(RepoDetails(self.repo_path, sub_paths=['src']).dir_commit_number(), 2)
+        self.assertEqual(RepoDetails(self.repo_path, sub_paths=['src', 'docs']).dir_commit_number(),
+                         3)
+
+
+class ModificationsTest(RepoDetailsTestCase):
+    """
+    Test counting the local modifications.
+    """
+    def setUp(self):
+        super().setUp()
+        self.commit('src/a.txt', 'src/b.txt', 'src/c.py', 'docs/d.txt')
+        self.write('src/a.txt', 'changed\n')
+        self.write('src/b.txt', 'changed\n')
+        self.write('docs/d.txt', 'changed\n')
+
+    def test_mods(self):
+        self.assertEqual(RepoDetails(self.repo_path).mods(), 3)
+        self.assertEqual(RepoDetails(self.repo_path).dir_mods(), 3)
+
+    def test_dir_mods(self):
+        self.assertEqual(RepoDetails(self.repo_path, sub_paths=['src']).dir_mods(), 2)
+        self.assertEqual(RepoDetails(self.repo_path, sub_paths=['\\docs']).dir_mods(), 1)
+        self.assertEqual(RepoDetails(self.repo_path, sub_paths=['src/c.py']).dir_mods(), 0)
+
+    def test_dir_mods_pathspec(self):
+        # The sub_paths are pathspecs, the same as in the commit history queries.
+        self.assertEqual(RepoDetails(self.repo_path, sub_paths=['src/*.txt']).dir_mods(), 2)
+        self.assertEqual(RepoDetails(self.repo_path, sub_paths=[':(glob)src/**']).dir_mods(), 2)
+        self.assertEqual(RepoDetails(self.repo_path, sub_paths=['*']).dir_mods(), 3)
+        self.assertEqual(RepoDetails(self.repo_path, sub_paths=['/']).dir_mods(), 3)
+
+    def test_dir_mods_many_overlapping_sub_paths(self):
+        paths = ['src/a.txt', 'src/b.txt', 'src/c.py', 'docs/d.txt', 'src/x/e.txt', 'src/x/y/f.txt',
+                 'srcs/g.txt', 'lib/h.txt', 'lib/i/j.txt', 'tools/k.txt']
+        self.commit(*paths)
+        for path in paths:
+            self.write(path, 'changed again\n')
+        sub_paths = ['src/x', 'src/x/y', 'src/x/y/', 'src/b.txt', 'lib/i', 'lib/i/j.txt', 'tools/',
+                     'tool', 'src/x/y/f.txt', 'srcs/g.txt', 'docs/d.txt', 'missing']
+        prefixes = tuple(sub_path.rstrip('/') + '/' for sub_path in sub_paths)
+        expected = sum(1 for path in paths if (path + '/').startswith(prefixes))
+
+        repo_details = RepoDetails(self.repo_path, sub_paths=sub_paths)
+        self.assertEqual(repo_details.mods(), len(paths))
+        self.assertEqual(repo_details.dir_mods(), expected)
+        self.assertEqual(expected, 7)
+
+    def test_staged_rename(self):
+        # With -z the original path of a rename is a record of its own, which must be skipped.
+        self.git('mv', 'src/a.txt', 'src/renamed a.txt')
+        repo_details = RepoDetails(self.repo_path, sub_paths=['src'])
+        self.assertEqual(sorted(repo_details._local_modifications()),
+                         ['docs/d.txt', 'src/b.txt', 'src/renamed a.txt'])
+        self.assertEqual(repo_details.mods(), 3)
+        self.assertEqual(repo_details.dir_mods(), 2)
+
+    def test_mods_uses_dir_mods_with_directory_hash(self):
+        repo_details = RepoDetails(self.repo_path, sub_paths=['docs'], use_directory_hash=True)
+        self.assertEqual(repo_details.mods(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
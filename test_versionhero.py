@@ -0,0 +1,90 @@
+"""
+Tests for the versionhero keyword replacement.
+"""
+import unittest
+from versionhero import KeywordReplacer
+
+
+class FakeRepoDetails:
+    """
+    Stands in for RepoDetails with fixed values.
+    """
+    def branch_name(self):
+        return 'main'
+
+    def mods(self):
+        return 0
+
+    def dir_mods(self):
+        return 0
+
+    def commit_number(self):
+        return 12
+
+    def commit_datetime(self, datetime_format=None):
+        return datetime_format.replace('%Y', '2026') if datetime_format else '2026-01-02'
+
+    def current_datetime(self, datetime_format=None):
+        return datetime_format.replace('%Y', '2027') if datetime_format else '2027-01-02'
+
+    def sha(self, num_chars=7):
+        return '9c122ad0123456789'[:int(num_chars or 7)]
+
+    def dir_sha(self, num_chars=7):
+        return 'abcdef0123456789'[:int(num_chars or 7)]
+
+    def has_mods(self, true_value=True, false_value=False):
+        return false_value
+
+    def has_dir_mods(self, true_value=True, false_value=False):
+        return false_value
+
+    def version(self, separator=None, version_format=None):
+        if version_format:
+            return version_format.replace('%M', '1').replace('%m', '2').replace('%p', '5')
+        return (separator or '.').join(['1', '2', '5', '0'])
+
+    def semver(self):
+        return '1.2.5'
+
+    def semver_extended(self):
+        return '1.2.5+sha.9c122ad'
+
+    def major(self):
+        return '1'
+
+    def minor(self):
+        return '2'
+
+    def patch(self):
+        return '5'
+
+
+class KeywordReplacerTest(unittest.TestCase):
+    """
+    Test the KeywordReplacer class.
+    """
+    def replace(self, text):
+        return KeywordReplacer(text, FakeRepoDetails()).execute()
+
+    def test_single_keywords(self):
+        self.assertEqual(self.replace('$GITBRANCHNAME$'), 'main')
+        self.assertEqual(self.replace('$GITHASH12$'), '9c122ad01234')
+        self.assertEqual(self.replace('$GITVERSION_$'), '1_2_5_0')
+        self.assertEqual(self.replace('$GITSEMVEREX$'), '1.2.5+sha.9c122ad')
+        self.assertEqual(self.replace('$GITMODS?-dirty:-clean$'), '-clean')
+
+    def test_greedy_keyword_followed_by_keyword(self):
+        # Greedy arguments run to the last key character on the line, so the keywords after them
+        # must already have been replaced.
+        self.assertEqual(self.replace('ver=$GITVERSIONF%M.%m.%p$+$GITHASH$'), 'ver=1.2.5+9c122ad')
+        self.assertEqual(self.replace('$GITCOMMITDATE%Y$ on $GITBRANCHNAME$'), '2026 on main')
+        self.assertEqual(self.replace('$GITBUILDDATE%Y$ build #GITCOMMITNUMBER#'), '2027 build 12')
+
+    def test_keywords_on_separate_lines(self):
+        self.assertEqual(self.replace('$GITCOMMITDATE%Y$\n$GITVERSIONF%M$\n$GITPATCH$'),
+                         '2026\n1\n5')
+
+
+if __name__ == '__main__':
+    unittest.main()
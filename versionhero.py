@@ -5,12 +5,32 @@ import argparse
 import os
 import re
 import shutil
+from pathlib import Path
 from time import time
 from repo_details import RepoDetails
 
 
 KEY_CHARACTERS = r'[!@#$%^&*]'
 
+# The compiled keyword patterns, keyed by (keyword, keyword_arg_pattern).
+_PATTERN_CACHE = {}
+
+
+def _keyword_pattern(keyword, keyword_arg_pattern=''):
+    """
+    Get the compiled pattern of a keyword between two KEY_CHARACTERS.
+    :param keyword: the keyword (not including any KEY_CHARACTERS)
+    :param keyword_arg_pattern: the regular expression match pattern of the keyword's arguments
+    :return: the compiled pattern
+    """
+    pattern = _PATTERN_CACHE.get((keyword, keyword_arg_pattern))
+    if pattern is None:
+        pattern = re.compile(
+            str.format(r'{0}{1}{2}{0}', KEY_CHARACTERS, keyword, keyword_arg_pattern))
+        _PATTERN_CACHE[(keyword, keyword_arg_pattern)] = pattern
+
+    return pattern
+
 
 class VersionHero:
     """
@@ -27,10 +47,9 @@ class VersionHero:
         if self.args.rename():
             return self.args.input_file()
         else:
-            file = open(self.args.input_file(), 'r')
-            file_text = file.read()
-            file.close()
-            return file_text
+            # Keep the template's own line endings, so they are written back unchanged.
+            with open(self.args.input_file(), 'r', encoding='utf-8', newline='') as file:
+                return file.read()
 
     def save_template_text(self, text):
         """
@@ -41,15 +60,26 @@ class VersionHero:
         if self.args.rename():
             shutil.copyfile(self.args.input_file(), text)
         else:
-            if os.path.exists(self.args.backup_file()):
-                os.remove(self.args.backup_file())
-
-            if os.path.exists(self.args.output_file()):
-                os.rename(self.args.output_file(), self.args.backup_file())
-
-            file = open(self.args.output_file(), 'w')
-            file.write(text)
-            file.close()
+            # Write the new text next to the output first, so the output is only replaced once the
+            # text has been completely written.
+            temp_file = self.args.output_file() + '.tmp'
+            try:
+                with open(temp_file, 'w', encoding='utf-8', newline='') as file:
+                    file.write(text)
+
+                try:
+                    os.replace(self.args.output_file(), self.args.backup_file())
+                except FileNotFoundError:
+                    # There is no output to back up, so remove any backup left from an older one.
+                    try:
+                        os.remove(self.args.backup_file())
+                    except FileNotFoundError:
+                        pass
+                os.replace(temp_file, self.args.output_file())
+            finally:
+                # The temp file is only left behind if writing or replacing the output failed.
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
 
     def execute(self):
         """
@@ -96,6 +126,7 @@ class ProgramArgs:
                             action='store_true')
 
         self.args = parser.parse_args()
+        self._cwd = os.getcwd()
         self._input_file = None
         self._repo_dir = None
         self._project_dirs = None
@@ -110,7 +141,7 @@ class ProgramArgs:
 
         input_file = self.args.template
         if not os.path.isabs(input_file):
-            input_file = os.path.abspath(os.path.join(os.getcwd(), input_file))
+            input_file = os.path.abspath(os.path.join(self._cwd, input_file))
 
         # If this file is to be renamed don't add '.git' to the end.
         if not self.rename():
@@ -144,11 +175,15 @@ class ProgramArgs:
         # Initialize the repo_dir if it was empty or a relative path.
         repo_dir = self.args.repo_dir
         if not repo_dir or not os.path.isabs(repo_dir):
-            repo_dir = os.path.abspath(os.path.join(os.getcwd(), repo_dir))
-
-        # Find the root directory of the repository by looking for a '.git' folder.
-        while not os.path.isdir(os.path.join(repo_dir, '.git')):
-            repo_dir = os.path.abspath(os.path.join(repo_dir, '..'))
+            repo_dir = os.path.abspath(os.path.join(self._cwd, repo_dir))
+
+        # Find the root directory of the repository by looking for a '.git' folder, stopping at the
+        # root of the file system.
+        repo_path = Path(repo_dir)
+        for directory in (repo_path, *repo_path.parents):
+            if (directory / '.git').is_dir():
+                repo_dir = str(directory)
+                break
 
         self._repo_dir = repo_dir
         return self._repo_dir
@@ -166,7 +201,7 @@ class ProgramArgs:
         if self.args.project_dir:
             for project_dir in self.args.project_dir:
                 if not os.path.isabs(project_dir):
-                    project_dir = os.path.abspath(os.path.join(os.getcwd(), project_dir))
+                    project_dir = os.path.abspath(os.path.join(self._cwd, project_dir))
                 project_dir = project_dir.replace(self.repo_dir(), '')
                 if len(project_dir) == 0:
                     project_dir = '.'
@@ -232,17 +267,16 @@ class KeywordReplacer:
                                 substitution_lambda pass them in this dictionary
         :return: None
         """
-        keyword = str.format(r'{0}{1}{2}{0}', KEY_CHARACTERS, keyword, keyword_arg_pattern)
-        while True:
-            match = re.search(keyword, self.text)
-            if match is None:
-                break
+        pattern = _keyword_pattern(keyword, keyword_arg_pattern)
+
+        if additional_args:
+            def substitute(match):
+                return str(substitution_lambda(**{**match.groupdict(), **additional_args}))
+        else:
+            def substitute(match):
+                return str(substitution_lambda(**match.groupdict()))
 
-            if not additional_args:
-                additional_args = {}
-            substitution_args = {**match.groupdict(), **additional_args}
-            substitution = str(substitution_lambda(**substitution_args))
-            self.text = self.text.replace(match.group(), substitution)
+        self.text = pattern.sub(substitute, self.text)
 
     def keywords(self):
         return [
@@ -267,7 +301,9 @@ class KeywordReplacer:
 
     def execute(self):
         """
-        Execute all of the keyword replacements in the supplied text
+        Execute all of the keyword replacements in the supplied text. Each keyword gets its own
+        pass, in the order of keywords(), so keywords with a greedy argument (eg GITCOMMITDATE) only
+        see the text after the keywords before them have been replaced.
         :return: the new text string
         """
         for keyword in self.keywords():